@@ -1,12 +1,22 @@
+import argparse
+import hashlib
 import json
 import os
 import re
-from moviepy.editor import ImageClip, AudioFileClip, CompositeVideoClip, TextClip
-# Ensure moviepy.editor is imported if audio_loop is used directly on the class
-import moviepy.editor as mpy
-from PIL import Image, ImageDraw, ImageFont
+import shutil
+import subprocess
+import sys
+import imageio_ffmpeg
+from PIL import Image, ImageDraw, ImageFont, __version__ as PILLOW_VERSION
+import numpy as np
 import traceback
-import math # For ceiling function in looping
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+# orjson is an optional, much faster JSON parser; fall back to stdlib json if missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Set up directories
 os.makedirs("assets", exist_ok=True)
@@ -17,6 +27,7 @@ os.makedirs("output", exist_ok=True)
 # Try to find a suitable background, or fallback to generating one
 BACKGROUND_IMAGE_PATH = "assets/background.jpg" # User should place their background here
 MUSIC_FILE_PATH = "assets/music.mp3" # User should place their music file here
+HIGH_QUALITY_BG = False # Resize the background with LANCZOS (sharper but much slower than BILINEAR)
 # Try common system fonts, fallback to Pillow's default if none are found
 FONT_PATHS_TO_TRY = [
     "assets/arial.ttf", # Place custom font here first
@@ -27,17 +38,42 @@ FONT_PATHS_TO_TRY = [
     "arial.ttf", # Arial (often available, fallback non-mono)
 ]
 OUTPUT_VIDEO_PATH = "output/trick_question_video.mp4"
+# RAM-backed scratch directory (Linux tmpfs) the video is encoded into before being moved to
+# OUTPUT_VIDEO_PATH; None encodes straight into OUTPUT_VIDEO_PATH
+SCRATCH_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
 QUESTION_DATA_CACHE = "output/question_data.json" # Cache for the generated question data
-IMAGE_CACHE = "output/question_image.png" # Cache for the generated image
+IMAGE_CACHE = "output/question_image.bmp" # Renders are cached as question_image.<key>.bmp (uncompressed: ffmpeg re-reads it every frame)
+ANSWER_IMAGE_CACHE = "output/answer_image.png" # Answer reveal banners are cached as answer_image.<key>.png
+RENDER_CACHE_KEEP = 5 # Most recently used renders kept per cache (each question BMP is ~6 MB); older ones are deleted
+MUSIC_CACHE_TEMPLATE = "output/music_{duration}s.{key}.m4a" # Music looped/trimmed to the video length, encoded once per source file
+FONT_CACHE_PATH = ".font_cache.json" # Font detected by find_font on a previous run (per platform + Pillow version)
 
 # Video settings
 VIDEO_WIDTH = 1080
 VIDEO_HEIGHT = 1920
-VIDEO_FPS = 30
+VIDEO_FPS = 30 # Frame rate of the answer reveal (keeps its fade-in smooth)
+LOW_FPS = 10 # Frame rate of the static part before the reveal; players just show each frame longer
 VIDEO_DURATION_SECONDS = 15 # Standard short video length
 ANSWER_REVEAL_START_SECONDS = 12
 ANSWER_REVEAL_DURATION_SECONDS = VIDEO_DURATION_SECONDS - ANSWER_REVEAL_START_SECONDS
-VIDEO_BITRATE = "5000k"
+ANSWER_FADE_IN_SECONDS = 0.5 # Fade-in of the answer banner (ffmpeg fades its alpha channel)
+VIDEO_BITRATE = "5000k" # Hardware encoders only; libx264 uses constant quality (VIDEO_CRF)
+VIDEO_PRESET = "veryfast" # libx264 speed preset; a still slide gains almost nothing from slower presets ('ultrafast' is faster, bigger files)
+VIDEO_CRF = 23 # libx264 constant quality (lower is better quality/bigger files)
+# ffmpeg does all the encoding; set FFMPEG_BINARY to use a system build instead of the bundled one
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY") or imageio_ffmpeg.get_ffmpeg_exe()
+# H.264 encoder: "auto" (default) probes for a hardware encoder and falls back to libx264 (CPU);
+# or name one, e.g. "libx264" or "h264_nvenc". Hardware encoders are several times faster for
+# this static clip, but give slightly lower quality than libx264 at the same size.
+VIDEO_CODEC = os.environ.get("VIDEO_CODEC", "auto")
+# Hardware encoders in probe order, with their speed/quality params (VIDEO_BITRATE caps the bitrate)
+HWACCEL_ENCODERS = [
+    ("h264_nvenc", ["-preset", "p4", "-tune", "ll", "-rc", "vbr", "-cq", "23"]), # NVIDIA
+    ("h264_qsv", ["-preset", "veryfast", "-global_quality", "23"]), # Intel Quick Sync
+    ("h264_videotoolbox", ["-q:v", "50"]), # macOS constant quality (Apple Silicon)
+    ("h264_videotoolbox", []), # macOS on Intel, which has no constant quality mode
+]
+FFMPEG_HWACCEL_PARAMS = [] # Extra ffmpeg params for the chosen encoder (filled in by select_video_codec)
 
 # Text/Layout settings
 PADDING_X = 60 # Left/right padding for text content
@@ -45,13 +81,17 @@ TOP_PROMPT_Y = 60 # Y position for the top prompt
 TITLE_FONT_SIZE = 65
 CODE_FONT_SIZE = 50 # Monospaced font is ideal here
 OPTION_FONT_SIZE = 55
+OPTION_FONT_SHRINK_STEP = 5 # Option font size reduction per retry when options overflow
+OPTION_FONT_SHRINK_TRIES = 3 # Max retries with a smaller option font before dropping options
 PROMPT_FONT_SIZE = 40
+ANSWER_FONT_SIZE = 60 # Slightly larger font for answer
 TEXT_COLOR = "white"
 CODE_COLOR_DEFAULT = (100, 200, 255) # Light blue/cyan
 CODE_COLOR_KEYWORD = (255, 150, 0) # Orange
 CODE_COLOR_STRING = (0, 255, 150) # Green/aqua
 CODE_COLOR_COMMENT = (150, 150, 150) # Grey
 ANSWER_TEXT_COLOR = "lime"
+ANSWER_BG_COLOR = (0, 0, 0, 179) # Semi-transparent black (0.7 opacity) behind the answer
 OPTION_TEXT_COLOR = "yellow"
 CODE_BG_COLOR = (30, 30, 50, 230) # Semi-transparent dark blue/purple
 CODE_OUTLINE_COLOR = (100, 200, 255)
@@ -62,14 +102,80 @@ BOTTOM_MARGIN = 50 # Minimum space to leave at the bottom
 
 # Ollama settings (if used)
 OLLAMA_MODEL = 'deepseek-coder:6.7b' # Or choose another suitable model
+OLLAMA_JSON_MODE = True # Ask Ollama for grammar-constrained JSON; set False if that is slow on your setup (the reply is still extracted below)
 # --- End Configuration ---
 
+# Checked once at startup instead of on every video; the stat also keys the music cache
+MUSIC_FILE_STAT = os.stat(MUSIC_FILE_PATH) if os.path.isfile(MUSIC_FILE_PATH) else None
+MUSIC_FILE_EXISTS = MUSIC_FILE_STAT is not None
+
 # Global variable for the detected font path
 DETECTED_FONT_PATH = None
+FONT_SEARCH_DONE = False # Set once find_font has probed FONT_PATHS_TO_TRY, so it only runs once
+LOADED_FONTS = {} # Fonts loaded so far by (path, size), so each TTF size is parsed once per process
+
+# --- Precompiled Regex Patterns ---
+# Compiled once at import instead of being re-parsed on every call
+# Markdown fences/quotes to remove from start/end of string values, any number of times
+CLEAN_START_RE = re.compile(
+    r"^(?:(?:"
+    r"```(?:python|json|text)?"  # ```python, ```json, ```text, ```
+    r"|'''(?:python)?"           # '''python, '''
+    r'|"""(?:python)?'           # """python, """
+    r"|['\"]"                    # Leading single/double quote
+    r")\s*)+",
+    re.IGNORECASE,
+)
+CLEAN_END_RE = re.compile(
+    r"(?:\s*(?:"
+    r"```"        # Trailing ```
+    r"|'''"       # Trailing '''
+    r'|"""'       # Trailing """
+    r"|['\"]"     # Trailing single/double quote
+    r"))+$"
+)
+CLEAN_EDGE_CHARS = "`'\"" # Every start/end pattern above begins/ends with one of these
+JSON_BLOCK_RE = re.compile(r'```json\s*({.*?})\s*```', re.DOTALL | re.IGNORECASE)
+PYTHON_BLOCK_RE = re.compile(r'```python\s*({.*?})\s*```', re.DOTALL | re.IGNORECASE)
+COMMENT_LINE_RE = re.compile(r"^\s*#.*?\n", re.MULTILINE)
+TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+# Making check more robust to handle optional space after parenthesis
+OPTION_PREFIX_RE = re.compile(r'^[A-D]\)\s*', re.IGNORECASE)
+ANSWER_LETTER_RE = re.compile(r'^[A-D]$')
+# The only escapes the prompt asks for in "code" (plus an escaped backslash), decoded in one pass
+CODE_ESCAPE_RE = re.compile(r"\\([\\nt])")
+CODE_ESCAPES = {"n": "\n", "t": "\t", "\\": "\\"}
+
+# Keywords that colour a code line when they are its first word
+PYTHON_KEYWORDS = frozenset({
+    "def", "class", "if", "else", "elif", "for", "while", "try", "except", "finally",
+    "return", "import", "from", "with", "yield", "pass", "break", "continue", "in", "is",
+    "not", "and", "or", "lambda", "async", "await", "global", "nonlocal", "assert", "del",
+})
 
 def find_font():
     """Tries to find a suitable font from the predefined list."""
-    global DETECTED_FONT_PATH
+    global DETECTED_FONT_PATH, FONT_SEARCH_DONE
+    if FONT_SEARCH_DONE: # Already probed in this process
+        return DETECTED_FONT_PATH
+    FONT_SEARCH_DONE = True
+
+    # --- Result From a Previous Run ---
+    # Skips the test loads, as long as the font is still there and no font earlier in the list appeared since
+    cache_key = {"platform": sys.platform, "pillow": PILLOW_VERSION, "paths": FONT_PATHS_TO_TRY}
+    try:
+        with open(FONT_CACHE_PATH, "r", encoding='utf-8') as f:
+            font_cache = json.load(f)
+        cached_path = font_cache.get("path")
+        if font_cache.get("key") == cache_key and cached_path in FONT_PATHS_TO_TRY and os.path.exists(cached_path):
+            earlier_paths = FONT_PATHS_TO_TRY[:FONT_PATHS_TO_TRY.index(cached_path)]
+            if not any(os.path.exists(font_path) for font_path in earlier_paths):
+                print(f"✅ Found and using font: {cached_path} (cached)")
+                DETECTED_FONT_PATH = cached_path
+                return DETECTED_FONT_PATH
+    except (OSError, ValueError, AttributeError):
+        pass # No usable cache; do the full search
+
     for font_path in FONT_PATHS_TO_TRY:
         try:
             # Basic check: does the file exist?
@@ -78,12 +184,68 @@ def find_font():
                 _ = ImageFont.truetype(font_path, 10)
                 print(f"✅ Found and using font: {font_path}")
                 DETECTED_FONT_PATH = font_path
+                try:
+                    with open(FONT_CACHE_PATH, "w", encoding='utf-8') as f:
+                        json.dump({"key": cache_key, "path": font_path}, f)
+                except OSError as e_cache:
+                    print(f"⚠️ Could not save font cache: {e_cache}")
                 return DETECTED_FONT_PATH
         except Exception:
             continue # Try the next font
     print("⚠️ No suitable TTF/TTC font found in predefined paths. Using Pillow's default font.")
     return None
 
+def load_font(size):
+    """Returns the detected font at the given size (Pillow's default font if none), loading it only once."""
+    key = (DETECTED_FONT_PATH, size)
+    if key not in LOADED_FONTS:
+        if DETECTED_FONT_PATH:
+            LOADED_FONTS[key] = ImageFont.truetype(DETECTED_FONT_PATH, size)
+        else: # Fallback to Pillow's default bitmap font
+            LOADED_FONTS[key] = ImageFont.load_default()
+    return LOADED_FONTS[key]
+
+def encoder_works(codec, params=()):
+    """Checks that ffmpeg can actually open an encoder with these params (listed encoders may lack the hardware)."""
+    test_cmd = [
+        FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+        "-frames:v", "1", "-c:v", codec, *params, "-pix_fmt", "yuv420p", "-f", "null", "-",
+    ]
+    try:
+        return subprocess.run(test_cmd, capture_output=True, timeout=30).returncode == 0
+    except Exception:
+        return False
+
+def detect_hwaccel():
+    """Probes ffmpeg for a usable hardware H.264 encoder, falling back to libx264."""
+    try:
+        encoders = subprocess.run(
+            [FFMPEG_BINARY, "-hide_banner", "-encoders"], capture_output=True, text=True, timeout=30
+        ).stdout
+    except Exception as e:
+        print(f"⚠️ Could not list ffmpeg encoders: {e}. Using libx264.")
+        return "libx264", []
+
+    for codec, params in HWACCEL_ENCODERS:
+        # VideoToolbox only exists on macOS; skip probing it elsewhere
+        if codec == "h264_videotoolbox" and sys.platform != "darwin":
+            continue
+        if codec in encoders and encoder_works(codec, params):
+            return codec, params
+    return "libx264", []
+
+def select_video_codec():
+    """Resolves VIDEO_CODEC="auto" to a concrete encoder, probing ffmpeg only once."""
+    global VIDEO_CODEC, FFMPEG_HWACCEL_PARAMS
+    if VIDEO_CODEC == "auto":
+        VIDEO_CODEC, FFMPEG_HWACCEL_PARAMS = detect_hwaccel()
+    else:
+        # A named hardware encoder gets the same params as when it is auto-detected
+        FFMPEG_HWACCEL_PARAMS = next((params for codec, params in HWACCEL_ENCODERS if codec == VIDEO_CODEC), [])
+    print(f"✅ Using video encoder: {VIDEO_CODEC}")
+    return VIDEO_CODEC
+
 # Helper function to clean markdown/quotes from string values
 def clean_string_value(text):
     """Removes common markdown/quoting artifacts from start/end of a string."""
@@ -93,44 +255,120 @@ def clean_string_value(text):
     # Remove leading/trailing whitespace first
     cleaned_text = text.strip()
 
-    # Patterns to remove from start/end (more comprehensive)
-    patterns_start = [
-        r"```(?:python|json|text|)\s*", # ```python, ```json, ```text, ```
-        r"'''(?:python|)\s*",          # '''python, '''
-        r'"""(?:python|)\s*',          # """python, """
-        r"['\"]",                      # Leading single/double quote
-    ]
-    patterns_end = [
-        r"\s*```",   # Trailing ```
-        r"\s*'''",   # Trailing '''
-        r'\s*"""',   # Trailing """
-        r"['\"]",   # Trailing single/double quote
-    ]
-
-    # Remove start patterns iteratively
-    made_change = True
-    while made_change:
-        made_change = False
-        original_length = len(cleaned_text)
-        for pattern in patterns_start:
-            cleaned_text = re.sub(f"^{pattern}", "", cleaned_text, flags=re.IGNORECASE)
-        if len(cleaned_text) != original_length:
-            made_change = True
-        cleaned_text = cleaned_text.strip() # Strip again after potential removal
-
-    # Remove end patterns iteratively
-    made_change = True
-    while made_change:
-        made_change = False
-        original_length = len(cleaned_text)
-        for pattern in patterns_end:
-            cleaned_text = re.sub(f"{pattern}$", "", cleaned_text)
-        if len(cleaned_text) != original_length:
-            made_change = True
-        cleaned_text = cleaned_text.strip() # Strip again
+    # Remove all start patterns in one pass, then all end patterns in one pass
+    # Plain values (the common case) never touch the regex engine: a single
+    # character check rules out every pattern
+    if cleaned_text[:1] in CLEAN_EDGE_CHARS:
+        cleaned_text = CLEAN_START_RE.sub("", cleaned_text).strip()
+    if cleaned_text[-1:] in CLEAN_EDGE_CHARS:
+        cleaned_text = CLEAN_END_RE.sub("", cleaned_text).strip()
 
     return cleaned_text
 
+def read_first_json_object(stream):
+    """
+    Collects streamed Ollama chunks until the first top-level {...} object is complete.
+    Braces inside JSON strings are ignored. Returns all text received up to that point.
+    """
+    buf = []
+    depth = 0
+    started = False
+    in_string = False
+    escaped = False
+    for chunk in stream:
+        piece = chunk['message']['content']
+        buf.append(piece)
+        for ch in piece:
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '{':
+                depth += 1
+                started = True
+            elif ch == '}' and started:
+                depth -= 1
+            elif ch == '"' and started:
+                in_string = True
+            if started and depth == 0:
+                break
+        if started and depth == 0:
+            # Stop pulling tokens; closing the stream drops the request so the model stops generating
+            if hasattr(stream, 'close'):
+                stream.close()
+            break
+    return "".join(buf)
+
+def validate_question_data(data):
+    """
+    Cleans and validates the fields of a question dict (question, code, options, correct_answer).
+    Returns the cleaned copy, or None if any field is missing or malformed.
+    """
+    if not isinstance(data, dict):
+        print(f"❌ Question data is not a JSON object. Found: {type(data).__name__}")
+        return None
+
+    print("🧹 Cleaning and validating JSON fields...")
+    validated_data = {}
+    is_valid = True
+
+    # Question
+    q_val = data.get('question')
+    if isinstance(q_val, str):
+        validated_data['question'] = clean_string_value(q_val)
+    else:
+        print("❌ Field 'question' is missing or not a string.")
+        is_valid = False
+
+    # Code
+    c_val = data.get('code')
+    if isinstance(c_val, str):
+        # Clean markdown, but preserve internal newlines and indentation
+        validated_data['code'] = clean_string_value(c_val)
+        # Basic check for expected newlines
+        if r'\n' not in validated_data['code'] and '\n' in validated_data['code'].strip():
+             # If model used literal newlines instead of escaped \n, fix it for JSON
+             print("⚠️ Fixing literal newlines in 'code' field to escaped '\\n'.")
+             validated_data['code'] = validated_data['code'].replace('\n', '\\n')
+    else:
+        print("❌ Field 'code' is missing or not a string.")
+        is_valid = False
+
+    # Options
+    o_val = data.get('options')
+    if isinstance(o_val, list) and len(o_val) == 4 and all(isinstance(opt, str) for opt in o_val):
+        cleaned_options = [clean_string_value(opt) for opt in o_val]
+        # Check if options start with A/B/C/D)
+        if all(OPTION_PREFIX_RE.match(opt.strip()) for opt in cleaned_options):
+             validated_data['options'] = cleaned_options
+        else:
+             print("❌ Field 'options' list items do not all start with A)/B)/C)/D) format.")
+             is_valid = False
+    else:
+        print("❌ Field 'options' is missing, not a list of 4 strings.")
+        is_valid = False
+
+    # Correct Answer
+    ca_val = data.get('correct_answer')
+    if isinstance(ca_val, str):
+         cleaned_ca = clean_string_value(ca_val).strip().upper()
+         if ANSWER_LETTER_RE.match(cleaned_ca):
+            validated_data['correct_answer'] = cleaned_ca
+         else:
+            print(f"❌ Field 'correct_answer' is not a single letter A, B, C, or D. Found: '{cleaned_ca}'")
+            is_valid = False
+    else:
+         print("❌ Field 'correct_answer' is missing or not a string.")
+         is_valid = False
+
+    if is_valid:
+        print("✅ All fields validated successfully.")
+        return validated_data
+    return None
+
 # Step 1: Fetch a tricky programming question from Ollama or use sample
 def fetch_question():
     """
@@ -161,21 +399,24 @@ def fetch_question():
 
         print(f"🤖 Contacting Ollama model '{OLLAMA_MODEL}'...")
         try:
-            response = ollama.chat(model=OLLAMA_MODEL, messages=[{"role": "user", "content": prompt}])
+            format_args = {"format": "json"} if OLLAMA_JSON_MODE else {}
+            stream = ollama.chat(model=OLLAMA_MODEL, messages=[{"role": "user", "content": prompt}], stream=True, **format_args)
+            # Stream the reply and stop as soon as the JSON object is complete
+            # (skips the trailing whitespace tokens JSON mode tends to emit)
+            content = read_first_json_object(stream).strip()
 
-            if response and 'message' in response and 'content' in response['message']:
-                content = response['message']['content'].strip()
+            if content:
                 print("🔍 Raw response received from Ollama.")
 
                 # --- JSON Extraction and Cleaning ---
                 # 1. Try to find JSON within ```json ... ```
-                json_match = re.search(r'```json\s*({.*?})\s*```', content, re.DOTALL | re.IGNORECASE)
+                json_match = JSON_BLOCK_RE.search(content)
                 if json_match:
                     content = json_match.group(1)
                     print("🧹 Extracted JSON from ```json block.")
                 else:
                     # 2. If no ```json, try finding JSON within ```python ... ``` (less likely but possible)
-                    python_match = re.search(r'```python\s*({.*?})\s*```', content, re.DOTALL | re.IGNORECASE)
+                    python_match = PYTHON_BLOCK_RE.search(content)
                     if python_match:
                        content = python_match.group(1)
                        print("🧹 Extracted JSON from ```python block.")
@@ -192,76 +433,21 @@ def fetch_question():
 
                 # 4. Basic cleanup of potential lingering issues before parsing
                 # Remove potential python comments if they surround the JSON
-                content = re.sub(r"^\s*#.*?\n", "", content, flags=re.MULTILINE)
+                content = COMMENT_LINE_RE.sub("", content)
                 # Remove potential escaped newlines that shouldn't be there in the structure
                 # (but keep the literal \n needed inside code strings)
                 content = content.replace("\\\n", "")
                 # Fix trailing commas before closing brackets/braces
-                content = re.sub(r',\s*([}\]])', r'\1', content)
+                content = TRAILING_COMMA_RE.sub(r'\1', content)
 
                 print("Attempting to parse JSON...")
                 try:
-                    data = json.loads(content)
+                    data = orjson.loads(content) if orjson else json.loads(content)
                     print("✅ JSON parsed successfully.")
 
                     # --- Field-level Cleaning and Validation ---
-                    print("🧹 Cleaning and validating JSON fields...")
-                    validated_data = {}
-                    is_valid = True
-
-                    # Question
-                    q_val = data.get('question')
-                    if isinstance(q_val, str):
-                        validated_data['question'] = clean_string_value(q_val)
-                    else:
-                        print("❌ Field 'question' is missing or not a string.")
-                        is_valid = False
-
-                    # Code
-                    c_val = data.get('code')
-                    if isinstance(c_val, str):
-                        # Clean markdown, but preserve internal newlines and indentation
-                        validated_data['code'] = clean_string_value(c_val)
-                        # Basic check for expected newlines
-                        if r'\n' not in validated_data['code'] and '\n' in validated_data['code'].strip():
-                             # If model used literal newlines instead of escaped \n, fix it for JSON
-                             print("⚠️ Fixing literal newlines in 'code' field to escaped '\\n'.")
-                             validated_data['code'] = validated_data['code'].replace('\n', '\\n')
-                    else:
-                        print("❌ Field 'code' is missing or not a string.")
-                        is_valid = False
-
-                    # Options
-                    o_val = data.get('options')
-                    if isinstance(o_val, list) and len(o_val) == 4 and all(isinstance(opt, str) for opt in o_val):
-                        cleaned_options = [clean_string_value(opt) for opt in o_val]
-                        # Check if options start with A/B/C/D)
-                        # Making check more robust to handle optional space after parenthesis
-                        valid_prefixes = [r"A\)\s*", r"B\)\s*", r"C\)\s*", r"D\)\s*"]
-                        if all(any(re.match(p, opt.strip(), re.IGNORECASE) for p in valid_prefixes) for opt in cleaned_options):
-                             validated_data['options'] = cleaned_options
-                        else:
-                             print("❌ Field 'options' list items do not all start with A)/B)/C)/D) format.")
-                             is_valid = False
-                    else:
-                        print("❌ Field 'options' is missing, not a list of 4 strings.")
-                        is_valid = False
-
-                    # Correct Answer
-                    ca_val = data.get('correct_answer')
-                    if isinstance(ca_val, str):
-                         cleaned_ca = clean_string_value(ca_val).strip().upper()
-                         if re.match(r'^[A-D]$', cleaned_ca):
-                            validated_data['correct_answer'] = cleaned_ca
-                         else:
-                            print(f"❌ Field 'correct_answer' is not a single letter A, B, C, or D. Found: '{cleaned_ca}'")
-                            is_valid = False
-                    else:
-                         print("❌ Field 'correct_answer' is missing or not a string.")
-                         is_valid = False
-
-                    if is_valid:
-                        print("✅ All fields validated successfully.")
+                    validated_data = validate_question_data(data)
+                    if validated_data:
                         return validated_data
                     else:
                         print("❌ Validation failed. Falling back to sample question.")
@@ -278,8 +464,7 @@ def fetch_question():
                     return None # Indicate failure
 
             else:
-                print("❌ Error: Unexpected Ollama response format.")
-                print(f"📜 Response received: {response}")
+                print("❌ Error: Empty response received from Ollama.")
                 return None
         except Exception as e:
             print(f"❌ Error fetching or processing question from Ollama: {e}")
@@ -290,8 +475,9 @@ def fetch_question():
         print("ℹ️ Ollama module not installed. To generate questions dynamically, run: pip install ollama")
         return None # Indicate Ollama is not available
 
+@lru_cache(maxsize=1)
 def get_sample_question():
-    """Returns a default sample question dictionary."""
+    """Returns a default sample question dictionary (built once; treat it as read-only)."""
     print(" Ruko Jara - using sample question")
     # Example with a potentially longer option
     return {
@@ -319,6 +505,12 @@ def wrap_text(text, font, max_width):
     text = str(text) # Ensure text is a string
     lines = []
     paragraphs = text.split('\n')
+    # Measure each word once and add advance widths up, instead of re-measuring the growing line
+    # (advances are additive; bbox widths include glyph overhang and would overestimate the sum)
+    space_width = get_text_length(font, " ")
+    # The rendered width can differ from the advance sum by the overhang/bearing of the edge
+    # glyphs, so a line within this margin of max_width is measured exactly, as a whole
+    boundary_margin = getattr(font, 'size', 20)
 
     for paragraph in paragraphs:
         words = paragraph.split(' ')
@@ -327,30 +519,41 @@ def wrap_text(text, font, max_width):
             continue
 
         current_line = ""
+        current_width = 0
         for word in words:
             # Handle potential empty strings from multiple spaces
             if not word:
                  # If the line isn't empty, add a space, otherwise ignore
                  if current_line:
                      current_line += " "
+                     current_width += space_width
                  continue
 
-            test_line = f"{current_line} {word}".strip()
+            word_width = get_text_length(font, word)
+            if current_line:
+                line_width = current_width + space_width + word_width
+            else:
+                line_width = word_width
 
-            # Calculate text width using the reliable method
-            line_width, _ = get_text_size(font, test_line)
+            test_line = f"{current_line} {word}" if current_line else word
+            if abs(line_width - max_width) <= boundary_margin:
+                fits = get_text_size(font, test_line)[0] <= max_width
+            else:
+                fits = line_width <= max_width
 
-            if line_width <= max_width:
+            if fits:
                 current_line = test_line
+                current_width = line_width
             else:
                 # Add the previous line if it had content
                 if current_line:
                     lines.append(current_line)
                 # Start the new line with the current word
                 current_line = word
+                current_width = word_width
+
                 # Check if the single word itself exceeds max_width (force break)
                 word_width, _ = get_text_size(font, current_line)
-
                 if word_width > max_width:
                     # Simple character-based break for overly long words/tokens
                     # This is a basic fallback, might break mid-word
@@ -365,6 +568,7 @@ def wrap_text(text, font, max_width):
                         else: # No space, hard break
                             lines.append(current_line[:chars_per_line])
                             current_line = current_line[chars_per_line:]
+                    current_width = get_text_length(font, current_line)
 
         # Add the last remaining part of the line for the paragraph
         if current_line:
@@ -372,8 +576,20 @@ def wrap_text(text, font, max_width):
 
     return lines
 
+# Fonts measured so far, keyed by id() and kept alive so the ids stay unique while cached
+# (fonts come from LOADED_FONTS and live for the whole process anyway)
+MEASURED_FONTS = {}
+
 def get_text_size(font, text):
     """Abstraction layer for getting text dimensions."""
+    font_id = id(font)
+    MEASURED_FONTS.setdefault(font_id, font)
+    return measure_text(font_id, str(text))
+
+@lru_cache(maxsize=8192)
+def measure_text(font_id, text):
+    """Measures text with a font from MEASURED_FONTS. Results are cached per (font, text)."""
+    font = MEASURED_FONTS[font_id]
     try:
         if hasattr(font, 'getbbox'):
             # Ensure text is string for PIL
@@ -401,16 +617,126 @@ def get_text_size(font, text):
              except: pass
         return len(str(text)) * (fallback_height // 2), fallback_height
 
+def get_text_length(font, text):
+    """Returns the advance width of text (how far the pen moves), used to add up word widths."""
+    font_id = id(font)
+    MEASURED_FONTS.setdefault(font_id, font)
+    return measure_length(font_id, str(text))
+
+@lru_cache(maxsize=8192)
+def measure_length(font_id, text):
+    """Measures the advance width of text with a font from MEASURED_FONTS. Cached per (font, text)."""
+    font = MEASURED_FONTS[font_id]
+    try:
+        if hasattr(font, 'getlength'):
+            return font.getlength(text)
+    except Exception as e:
+        print(f"⚠️ Error calculating text length for '{text[:20]}...': {e}. Using its bounding box.")
+    # Older Pillow / unusual fonts: fall back to the bounding box width
+    return measure_text(font_id, text)[0]
+
+
+def get_image_cache_key(question_data):
+    """Returns the render key of the image for this question."""
+    # Hash everything the rendered image depends on besides the layout code itself,
+    # so changing a font size, colour or padding setting renders a new image
+    render_inputs = {
+        "question_data": question_data,
+        "font": DETECTED_FONT_PATH,
+        "background": BACKGROUND_IMAGE_PATH,
+        "background_mtime": os.path.getmtime(BACKGROUND_IMAGE_PATH) if os.path.exists(BACKGROUND_IMAGE_PATH) else None,
+        "high_quality_bg": HIGH_QUALITY_BG,
+        "size": [VIDEO_WIDTH, VIDEO_HEIGHT],
+        "layout": [PADDING_X, TOP_PROMPT_Y, BOTTOM_MARGIN],
+        "font_sizes": [TITLE_FONT_SIZE, CODE_FONT_SIZE, OPTION_FONT_SIZE, PROMPT_FONT_SIZE,
+                       OPTION_FONT_SHRINK_STEP, OPTION_FONT_SHRINK_TRIES],
+        "colors": [TEXT_COLOR, CODE_COLOR_DEFAULT, CODE_COLOR_KEYWORD, CODE_COLOR_STRING, CODE_COLOR_COMMENT,
+                   OPTION_TEXT_COLOR, CODE_BG_COLOR, CODE_OUTLINE_COLOR, OPTION_BG_COLOR,
+                   OPTION_OUTLINE_COLOR, OVERLAY_COLOR],
+    }
+    return hashlib.blake2b(json.dumps(render_inputs, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+def save_image_atomic(img, path):
+    """Saves img to path via a temporary file, so an interrupted save never leaves a truncated cache entry."""
+    base, ext = os.path.splitext(path)
+    tmp_path = f"{base}.{os.getpid()}.tmp{ext}" # Keeps the extension so PIL picks the same format
+    try:
+        img.save(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            try: os.remove(tmp_path)
+            except OSError: pass
+
+def use_cached_render(path):
+    """Returns True if the cached render at path exists, marking it as recently used."""
+    try:
+        os.utime(path) # Bumps the mtime that prune_render_cache orders by
+        return True
+    except OSError:
+        return False
+
+def prune_render_cache(cache_template, keep=RENDER_CACHE_KEEP):
+    """Deletes all but the `keep` most recently used <base>.<key><ext> renders of a cache."""
+    cache_dir, cache_name = os.path.split(cache_template)
+    prefix, ext = os.path.splitext(cache_name)
+    prefix += "."
+    try:
+        renders = [
+            entry for entry in os.scandir(cache_dir or ".")
+            # Skips in-progress saves (<key>.<pid>.tmp<ext>) of this or another process
+            if entry.name.startswith(prefix) and entry.name.endswith(ext) and ".tmp" not in entry.name
+        ]
+        renders.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in renders[keep:]:
+            os.remove(entry.path)
+    except OSError as e_prune:
+        print(f"⚠️ Could not prune old renders of '{cache_template}': {e_prune}")
+
+def get_image_cache_path(question_data):
+    """Returns the content-addressed cache path for the image of this question."""
+    base, ext = os.path.splitext(IMAGE_CACHE)
+    return f"{base}.{get_image_cache_key(question_data)}{ext}"
+
+def blend_rect(arr, x0, y0, x1, y1, color):
+    """Alpha-blends an RGB(A) colour over arr[y0:y1, x0:x1] (end exclusive, clipped to the array)."""
+    height, width = arr.shape[:2]
+    x0, y0, x1, y1 = max(int(x0), 0), max(int(y0), 0), min(int(x1), width), min(int(y1), height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    alpha = color[3] / 255.0 if len(color) == 4 else 1.0
+    region = arr[y0:y1, x0:x1, :3] # View into the image buffer, written in place
+    region[...] = (region * (1.0 - alpha) + np.array(color[:3]) * alpha + 0.5).astype(np.uint8)
+
+def fill_boxes(img, boxes):
+    """Draws all boxes into the image in one numpy pass.
+    Each box is ((x0, y0, x1, y1), fill, outline, outline_width) with inclusive corners, like draw.rectangle."""
+    arr = np.array(img) # One writable copy for every box
+    for (x0, y0, x1, y1), fill, outline, w in boxes:
+        # Interior first, then the four outline strips around it (they never overlap)
+        blend_rect(arr, x0 + w, y0 + w, x1 - w + 1, y1 - w + 1, fill)
+        blend_rect(arr, x0, y0, x1 + 1, y0 + w, outline) # Top
+        blend_rect(arr, x0, y1 - w + 1, x1 + 1, y1 + 1, outline) # Bottom
+        blend_rect(arr, x0, y0 + w, x0 + w, y1 - w + 1, outline) # Left
+        blend_rect(arr, x1 - w + 1, y0 + w, x1 + 1, y1 - w + 1, outline) # Right
+    return Image.fromarray(arr, img.mode)
 
 def create_text_image(question_data):
     """Generates the main image with question, code, options, etc."""
     global DETECTED_FONT_PATH # Use the globally found font
 
+    # --- Cache Check ---
+    # Identical question data renders an identical image, so skip the rendering entirely
+    cached_image_path = get_image_cache_path(question_data)
+    if use_cached_render(cached_image_path):
+        print(f"✅ Using cached image: {cached_image_path}")
+        return cached_image_path
+
     try:
         # --- Background Setup ---
         try:
             if os.path.exists(BACKGROUND_IMAGE_PATH):
-                img = Image.open(BACKGROUND_IMAGE_PATH).convert("RGBA")
+                img = Image.open(BACKGROUND_IMAGE_PATH) # Lazy: only the header is read here
                 # Resize while maintaining aspect ratio (cover)
                 img_ratio = img.width / img.height
                 target_ratio = VIDEO_WIDTH / VIDEO_HEIGHT
@@ -421,7 +747,23 @@ def create_text_image(question_data):
                     new_width = VIDEO_WIDTH
                     new_height = int(new_width / img_ratio)
 
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                if img.format == "JPEG":
+                    # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding,
+                    # never below the cover size, instead of decoding full resolution
+                    img.draft("RGB", (new_width, new_height))
+                img = img.convert("RGB")
+
+                if HIGH_QUALITY_BG:
+                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                elif new_width <= img.width <= new_width * 1.05 and img.height >= new_height:
+                    # Already within 5% of the target size: crop directly, no resampling
+                    new_width, new_height = img.size
+                else:
+                    # Fast integer box-filter downscale first, then BILINEAR for the remainder
+                    reduce_factor = img.width // new_width
+                    if reduce_factor >= 2:
+                        img = img.reduce(reduce_factor)
+                    img = img.resize((new_width, new_height), Image.Resampling.BILINEAR)
 
                 # Center crop
                 left = (new_width - VIDEO_WIDTH) / 2
@@ -432,28 +774,27 @@ def create_text_image(question_data):
 
             else:
                 print(f"⚠️ Background image '{BACKGROUND_IMAGE_PATH}' not found. Creating plain background.")
-                img = Image.new("RGBA", (VIDEO_WIDTH, VIDEO_HEIGHT), (20, 20, 40, 255)) # Dark blue default
+                img = Image.new("RGB", (VIDEO_WIDTH, VIDEO_HEIGHT), (20, 20, 40)) # Dark blue default
         except Exception as e_img:
             print(f"⚠️ Error loading/resizing background image: {e_img}. Using plain background.")
-            img = Image.new("RGBA", (VIDEO_WIDTH, VIDEO_HEIGHT), (20, 20, 40, 255))
+            img = Image.new("RGB", (VIDEO_WIDTH, VIDEO_HEIGHT), (20, 20, 40))
 
         # --- Overlay ---
-        overlay = Image.new('RGBA', img.size, OVERLAY_COLOR)
-        img = Image.alpha_composite(img, overlay)
-        draw = ImageDraw.Draw(img)
+        # The overlay is one flat colour over an opaque background, so a single RGB blend
+        # gives the same result as alpha compositing full RGBA buffers
+        tint = Image.new('RGB', img.size, OVERLAY_COLOR[:3])
+        # The canvas stays RGB from here on: boxes are alpha-blended in fill_boxes and the text
+        # is opaque, so no alpha channel (and no final RGB conversion copy) is needed
+        img = Image.blend(img, tint, OVERLAY_COLOR[3] / 255.0)
+        draw = ImageDraw.Draw(img) # Used for measuring during layout; drawing happens after the boxes
 
         # --- Font Loading ---
         try:
-            if DETECTED_FONT_PATH:
-                title_font = ImageFont.truetype(DETECTED_FONT_PATH, TITLE_FONT_SIZE)
-                code_font = ImageFont.truetype(DETECTED_FONT_PATH, CODE_FONT_SIZE)
-                option_font = ImageFont.truetype(DETECTED_FONT_PATH, OPTION_FONT_SIZE)
-                prompt_font = ImageFont.truetype(DETECTED_FONT_PATH, PROMPT_FONT_SIZE)
-            else: # Fallback to Pillow's default bitmap font
-                title_font = ImageFont.load_default()
-                code_font = ImageFont.load_default()
-                option_font = ImageFont.load_default()
-                prompt_font = ImageFont.load_default()
+            title_font = load_font(TITLE_FONT_SIZE)
+            code_font = load_font(CODE_FONT_SIZE)
+            option_font = load_font(OPTION_FONT_SIZE)
+            prompt_font = load_font(PROMPT_FONT_SIZE)
+            if not DETECTED_FONT_PATH:
                 print("ℹ️ Using default bitmap font. Appearance may vary.")
 
         except Exception as e_font:
@@ -469,33 +810,34 @@ def create_text_image(question_data):
         line_spacing_option = 10 # Spacing between lines *within* a wrapped option
         block_spacing = 40 # Space between major elements (prompt/question/code/options)
         option_inter_box_spacing = 25 # Vertical space between option boxes
+        # Layout records boxes and text first: boxes are filled in one numpy pass, then text goes on top
+        boxes = [] # ((x0, y0, x1, y1), fill, outline, outline_width)
+        text_ops = [] # (xy, text, fill, font, spacing)
 
-        # --- 0. Draw Prompt at Top ---
+        # --- 0. Lay Out Prompt at Top ---
         prompt_text = "Tap to pause! Answer in comments!"
         prompt_width, prompt_height = get_text_size(prompt_font, prompt_text)
         prompt_x = (VIDEO_WIDTH - prompt_width) // 2
-        # Draw text using the initial current_y
-        draw.text((prompt_x, current_y), prompt_text, fill=TEXT_COLOR, font=prompt_font)
+        # Place text using the initial current_y
+        text_ops.append(((prompt_x, current_y), prompt_text, TEXT_COLOR, prompt_font, 0))
         # Update current_y to be below the prompt for the next element
         current_y += prompt_height + block_spacing
 
-        # --- 1. Draw Question Text ---
+        # --- 1. Lay Out Question Text ---
         question_text = question_data.get('question', "Error: Question missing")
         question_lines = wrap_text(question_text, title_font, content_width)
-        # Use line height from the actual font if possible
-        _, line_height_title = get_text_size(title_font, "Tg") # Approx height for setup
-        for line in question_lines:
-            # Recalculate actual line height in case of font variations
-            _, actual_line_height = get_text_size(title_font, line)
-            draw.text((PADDING_X, current_y), line, fill=TEXT_COLOR, font=title_font)
-            current_y += actual_line_height + line_spacing_title
-        # Adjust Y: Add block spacing, remove last line spacing added
-        current_y += block_spacing - line_spacing_title
-
-        # --- 2. Draw Code Block ---
+        # Draw all wrapped lines in one call; Pillow handles the line stride internally
+        question_block = "\n".join(question_lines)
+        text_ops.append(((PADDING_X, current_y), question_block, TEXT_COLOR, title_font, line_spacing_title))
+        question_bbox = draw.multiline_textbbox((PADDING_X, current_y), question_block, font=title_font, spacing=line_spacing_title)
+        # Move Y below the drawn text + block spacing
+        current_y += (question_bbox[3] - question_bbox[1]) + block_spacing
+
+        # --- 2. Lay Out Code Block ---
         code_text = question_data.get('code', "# Error: Code missing")
         # Decode the escaped newlines from JSON into actual newlines for display
-        code_text_display = code_text.encode().decode('unicode_escape')
+        # (no bytes round-trip, so non-ASCII characters survive intact)
+        code_text_display = CODE_ESCAPE_RE.sub(lambda m: CODE_ESCAPES[m.group(1)], code_text)
         code_lines = code_text_display.split('\n')
         # Calculate code block dimensions for the background box
         code_block_content_height = 0
@@ -518,107 +860,125 @@ def create_text_image(question_data):
         code_box_y_start = current_y
         code_box_y_end = code_box_y_start + code_block_total_height
 
-        # Draw the code background box
-        draw.rectangle(
-            [(PADDING_X - code_block_padding_x, code_box_y_start),
-             (VIDEO_WIDTH - PADDING_X + code_block_padding_x, code_box_y_end)],
-            fill=CODE_BG_COLOR,
-            outline=CODE_OUTLINE_COLOR,
-            width=2 # Outline width
-        )
+        # Code background box
+        boxes.append((
+            (PADDING_X - code_block_padding_x, code_box_y_start,
+             VIDEO_WIDTH - PADDING_X + code_block_padding_x, code_box_y_end),
+            CODE_BG_COLOR,
+            CODE_OUTLINE_COLOR,
+            2 # Outline width
+        ))
 
-        # Draw code lines with basic syntax highlighting
+        # Code lines with basic syntax highlighting
         code_y = code_box_y_start + code_block_padding_y
         for line in code_lines:
             color = CODE_COLOR_DEFAULT
             stripped_line = line.strip()
+            # Leading identifier, so "else:", "return(x)", "return[x]" and "try:x=1" all count
+            token_end = 0
+            while token_end < len(stripped_line) and (stripped_line[token_end].isalnum() or stripped_line[token_end] == '_'):
+                token_end += 1
+            first_token = stripped_line[:token_end]
             # Check order: comment > keyword > string
             if stripped_line.startswith('#'):
                 color = CODE_COLOR_COMMENT
-            # More robust keyword check (matches whole words)
-            elif re.match(r'^\s*(def|class|if|else|elif|for|while|try|except|finally|return|import|from|with|yield|pass|break|continue|in|is|not|and|or|lambda|async|await|global|nonlocal|assert|del)\b', line):
+            # Keyword check on the whole first word (set lookup instead of a regex per line)
+            elif first_token in PYTHON_KEYWORDS:
                 color = CODE_COLOR_KEYWORD
             # Simple check for quotes (can be improved)
-            elif re.search(r'(\'|"|f\'|f"|\'\'\'|""")', line):
+            elif "'" in line or '"' in line:
                 color = CODE_COLOR_STRING
 
-            # Draw the text (using code_x for indentation within the box)
+            # Place the text (using code_x for indentation within the box)
             code_x = PADDING_X
             _, line_h = get_text_size(code_font, line if line else " ")
-            draw.text((code_x, code_y), line, fill=color, font=code_font)
+            text_ops.append(((code_x, code_y), line, color, code_font, 0))
             code_y += line_h + line_spacing_code
 
         current_y = code_box_y_end + block_spacing # Move Y below the code box + spacing
 
-        # --- 3. Draw Answer Options (Dynamically Sized) ---
+        # --- 3. Lay Out Answer Options (Dynamically Sized) ---
         options = question_data.get('options', ["Error: Options missing"] * 4)
         option_box_internal_padding_y = 15
         option_box_internal_padding_x = 15 # Padding inside the option box L/R
         option_wrap_width = content_width - (2 * option_box_internal_padding_x) # Width available for text wrap inside box
+        options_max_y = VIDEO_HEIGHT - BOTTOM_MARGIN
+
+        # --- Plan: Wrap and Measure All Options Before Drawing ---
+        option_font_size = OPTION_FONT_SIZE
+        for attempt in range(OPTION_FONT_SHRINK_TRIES + 1):
+            option_plans = [] # (wrapped text block, dynamic box height) per option
+            for option_text in options:
+                wrapped_option_lines = wrap_text(str(option_text), option_font, option_wrap_width)
+                option_block = "\n".join(wrapped_option_lines) or " " # Use space for empty option height
+                option_bbox = draw.multiline_textbbox((0, 0), option_block, font=option_font, spacing=line_spacing_option)
+                option_content_height = option_bbox[3] - option_bbox[1]
+                option_plans.append((option_block, option_content_height + (2 * option_box_internal_padding_y)))
+
+            options_total_height = sum(h for _, h in option_plans) + (len(option_plans) - 1) * option_inter_box_spacing
+            # Only TTF fonts can be reloaded at a smaller size
+            if current_y + options_total_height <= options_max_y or not DETECTED_FONT_PATH or attempt == OPTION_FONT_SHRINK_TRIES:
+                break
+            # Shrink the option font and re-plan, rather than drawing only some of the options
+            option_font_size -= OPTION_FONT_SHRINK_STEP
+            print(f"⚠️ Options overflow the image. Retrying with option font size {option_font_size}.")
+            option_font = load_font(option_font_size)
 
-        for i, option_text in enumerate(options):
+        # --- Place the Planned Option Boxes ---
+        for i, (option_block, dynamic_option_box_height) in enumerate(option_plans):
             box_y_start = current_y
-
-            # --- Calculate Dynamic Height ---
-            wrapped_option_lines = wrap_text(str(option_text), option_font, option_wrap_width)
-            option_content_height = 0
-            if wrapped_option_lines:
-                for line in wrapped_option_lines:
-                    _, line_h = get_text_size(option_font, line if line else " ")
-                    option_content_height += line_h + line_spacing_option
-                option_content_height -= line_spacing_option # Remove trailing spacing
-            else: # Handle empty option case
-                _, line_h = get_text_size(option_font, " ")
-                option_content_height = line_h
-
-            dynamic_option_box_height = option_content_height + (2 * option_box_internal_padding_y)
             box_y_end = box_y_start + dynamic_option_box_height
-            # --- End Calculate Dynamic Height ---
 
             # --- Overflow Check ---
+            # Still possible when even the smallest font size does not fit
             # Check if the *bottom* of the current box exceeds the screen limit minus margin
-            if box_y_end > VIDEO_HEIGHT - BOTTOM_MARGIN:
+            if box_y_end > options_max_y:
                 print(f"⚠️ Content overflow detected at option {i+1}. Stopping drawing options.")
                 # Optionally draw an ellipsis or warning?
                 # draw.text((PADDING_X, current_y), "...", fill="red", font=option_font)
                 # current_y += get_text_size(option_font, "...")[1] # Move down slightly if drawing ellipsis
                 break # Stop drawing more options
 
-            # Draw option background box using dynamic height
-            draw.rectangle(
-                [(PADDING_X - 10, box_y_start), # Use main PADDING_X for box horizontal position
-                 (VIDEO_WIDTH - PADDING_X + 10, box_y_end)],
-                fill=OPTION_BG_COLOR,
-                outline=OPTION_OUTLINE_COLOR,
-                width=1
-            )
+            # Option background box using dynamic height
+            boxes.append((
+                (PADDING_X - 10, box_y_start, # Use main PADDING_X for box horizontal position
+                 VIDEO_WIDTH - PADDING_X + 10, box_y_end),
+                OPTION_BG_COLOR,
+                OPTION_OUTLINE_COLOR,
+                1
+            ))
 
-            # --- Draw Wrapped Option Text ---
+            # --- Place Wrapped Option Text ---
             option_text_y = box_y_start + option_box_internal_padding_y
             option_text_x = PADDING_X + option_box_internal_padding_x # Start text inside the box padding
 
-            for line in wrapped_option_lines:
-                _, line_h = get_text_size(option_font, line if line else " ")
-                draw.text((option_text_x, option_text_y), line, fill=OPTION_TEXT_COLOR, font=option_font)
-                option_text_y += line_h + line_spacing_option
-            # --- End Draw Wrapped Option Text ---
+            text_ops.append(((option_text_x, option_text_y), option_block, OPTION_TEXT_COLOR, option_font, line_spacing_option))
+            # --- End Place Wrapped Option Text ---
 
             # Move Y for the next option box
             current_y = box_y_end + option_inter_box_spacing
 
         # Adjust current_y if options didn't overflow (remove last inter-box spacing)
         # Check if the loop completed fully (i points to the last index drawn)
-        if i == len(options) - 1 and box_y_end <= VIDEO_HEIGHT - BOTTOM_MARGIN:
+        if option_plans and i == len(option_plans) - 1 and box_y_end <= options_max_y:
              current_y -= option_inter_box_spacing
 
 
         # --- 4. Prompt at Bottom (Removed - Moved to Top) ---
 
+        # --- Draw: All Boxes in One Array Pass, Then Text on Top ---
+        img = fill_boxes(img, boxes)
+        draw = ImageDraw.Draw(img)
+        for xy, text, fill, font, spacing in text_ops:
+            draw.multiline_text(xy, text, fill=fill, font=font, spacing=spacing)
+
         # --- Save Image ---
-        img_rgb = img.convert("RGB") # Convert to RGB for JPEG/MP4 compatibility
-        img_rgb.save(IMAGE_CACHE)
-        print(f"✅ Image successfully generated: {IMAGE_CACHE}")
-        return IMAGE_CACHE
+        # Already RGB for MP4 compatibility; BMP is a plain copy of the pixels, with no
+        # zlib pass on save and no inflate each time ffmpeg reads the looped image
+        save_image_atomic(img, cached_image_path)
+        prune_render_cache(IMAGE_CACHE) # Each distinct question adds a render; keep the cache bounded
+        print(f"✅ Image successfully generated: {cached_image_path}")
+        return cached_image_path
 
     except Exception as e:
         print(f"❌ Fatal Error creating image: {e}")
@@ -626,206 +986,245 @@ def create_text_image(question_data):
         return None
 
 
-# Step 3: Generate the video with animations
-def create_video(image_path, question_data):
-    """Creates the final video using the generated image and question data."""
-    if not image_path or not os.path.exists(image_path):
-        print(f"❌ Cannot create video: Image path '{image_path}' is invalid or missing.")
-        return
-
-    # --- Resource Handles (for finally block) ---
-    img_clip = None
-    music_clip = None
-    answer_text_clip = None
-    final_composite_clip = None
-    full_music_clip = None # Handle for original music file
+def get_answer_display_text(question_data):
+    """Builds the answer reveal text from the correct answer letter and its option text."""
+    correct_answer_letter = question_data.get('correct_answer', '?').strip().upper()
+    options = question_data.get('options', [])
+    correct_option_full_text = f"({correct_answer_letter})" # Fallback text
+
+    # The correct letter followed by common separators, compiled once for all options
+    # Case-insensitive match, allowing optional space after parenthesis/dot etc.
+    option_letter_re = re.compile(rf"^\s*{re.escape(correct_answer_letter)}[\s).:\]]", re.IGNORECASE)
+    letter_length = len(correct_answer_letter)
+
+    # Find the full text of the correct option
+    for opt in options:
+        opt_str = str(opt).strip()
+        # Check if the option string starts with the correct letter followed by common separators
+        if option_letter_re.match(opt_str):
+            correct_option_full_text = opt_str
+            break
+         # Less reliable fallback if no separator matched (e.g., "AOption")
+         # (only the prefix is upper-cased, not the whole option)
+        elif opt_str[:letter_length].upper() == correct_answer_letter:
+            correct_option_full_text = opt_str # Keep searching for a better match potentially
+
+    return f"✅ Answer: {correct_option_full_text}"
+
+def get_reveal_cache_path(answer_display_text):
+    """Returns the content-addressed cache path for the answer reveal banner of this text."""
+    # Everything the banner depends on besides the layout code itself
+    render_inputs = {
+        "text": answer_display_text,
+        "font": DETECTED_FONT_PATH,
+        "font_size": ANSWER_FONT_SIZE,
+        "width": VIDEO_WIDTH - 2 * PADDING_X,
+        "colors": [ANSWER_TEXT_COLOR, ANSWER_BG_COLOR],
+    }
+    key = hashlib.blake2b(json.dumps(render_inputs, sort_keys=True).encode(), digest_size=16).hexdigest()
+    base, ext = os.path.splitext(ANSWER_IMAGE_CACHE)
+    return f"{base}.{key}{ext}"
 
+def create_reveal_image(question_data):
+    """Generates the answer reveal banner as a transparent PNG to overlay on the main image."""
     try:
-        print("🎬 Starting video creation process...")
-        # --- Base Image Clip ---
-        img_clip = ImageClip(image_path).set_duration(VIDEO_DURATION_SECONDS)
-
-        # --- Audio ---
-        if os.path.exists(MUSIC_FILE_PATH):
-            try:
-                print(f"🎵 Loading music: {MUSIC_FILE_PATH}")
-                full_music_clip = mpy.AudioFileClip(MUSIC_FILE_PATH)
-
-                # Ensure audio matches video duration using audio_loop
-                if full_music_clip.duration < VIDEO_DURATION_SECONDS:
-                    print(f"⚠️ Music duration ({full_music_clip.duration:.2f}s) is shorter than video ({VIDEO_DURATION_SECONDS}s). Looping.")
-                    # Use audio_loop to fill the duration
-                    # Note: audio_loop creates a new clip instance
-                    music_clip = full_music_clip.audio_loop(duration=VIDEO_DURATION_SECONDS)
-                    # No need to close full_music_clip here yet, finally block handles it
-                else:
-                    # Trim longer audio
-                    music_clip = full_music_clip.subclip(0, VIDEO_DURATION_SECONDS)
-                    # If subclip is the same object, don't close original yet
-                    # If subclip created a new instance, we might close original, but finally is safer
+        answer_display_text = get_answer_display_text(question_data)
+
+        # --- Cache Check ---
+        # The same answer text always renders the same banner
+        cached_reveal_path = get_reveal_cache_path(answer_display_text)
+        if use_cached_render(cached_reveal_path):
+            print(f"✅ Using cached answer reveal image: {cached_reveal_path}")
+            return cached_reveal_path
+
+        answer_font = load_font(ANSWER_FONT_SIZE)
+
+        # --- Layout ---
+        banner_width = VIDEO_WIDTH - 2 * PADDING_X # Width constrained by padding, height auto
+        banner_padding = 20
+        line_spacing_answer = 10
+        answer_lines = wrap_text(answer_display_text, answer_font, banner_width - 2 * banner_padding)
+        answer_block = "\n".join(answer_lines) or " "
+        measure_draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+        answer_bbox = measure_draw.multiline_textbbox((0, 0), answer_block, font=answer_font, spacing=line_spacing_answer)
+        banner_height = answer_bbox[3] + 2 * banner_padding
+
+        # --- Draw Banner ---
+        banner = Image.new("RGBA", (banner_width, banner_height), ANSWER_BG_COLOR)
+        draw = ImageDraw.Draw(banner)
+        # Text aligned left within the banner
+        draw.multiline_text((banner_padding, banner_padding), answer_block, fill=ANSWER_TEXT_COLOR, font=answer_font, spacing=line_spacing_answer)
+
+        save_image_atomic(banner, cached_reveal_path)
+        prune_render_cache(ANSWER_IMAGE_CACHE)
+        print(f"✅ Answer reveal image generated: {cached_reveal_path}")
+        return cached_reveal_path
 
-                print(f"✅ Music prepared with target duration: {VIDEO_DURATION_SECONDS:.2f}s (Actual: {music_clip.duration:.2f}s)")
-
-            except Exception as e_music:
-                print(f"⚠️ Error loading or processing music file '{MUSIC_FILE_PATH}': {e_music}. Video will have no audio.")
-                music_clip = None
-                # full_music_clip might still be open if error occurred mid-process
-        else:
-            print(f"ℹ️ Music file not found at '{MUSIC_FILE_PATH}'. Creating video without audio.")
-            music_clip = None
-
-        # --- Answer Reveal Text Clip ---
-        clips_to_compose = [img_clip] # Start with the base image
-        correct_answer_letter = question_data.get('correct_answer', '?').strip().upper()
-        options = question_data.get('options', [])
-        correct_option_full_text = f"({correct_answer_letter})" # Fallback text
-
-        # Find the full text of the correct option
-        for opt in options:
-            opt_str = str(opt).strip()
-            # Check if the option string starts with the correct letter followed by common separators
-            # Case-insensitive match, allowing optional space after parenthesis/dot etc.
-            if re.match(rf"^\s*{re.escape(correct_answer_letter)}[\s).:\]]", opt_str, re.IGNORECASE):
-                correct_option_full_text = opt_str
-                break
-             # Less reliable fallback if no separator matched (e.g., "AOption")
-            elif opt_str.upper().startswith(correct_answer_letter):
-                correct_option_full_text = opt_str # Keep searching for a better match potentially
-
-        answer_display_text = f"✅ Answer: {correct_option_full_text}"
-
-        try:
-            print("🎨 Creating answer reveal text clip...")
-            # Use detected font or common fallback if needed
-            font_for_answer = DETECTED_FONT_PATH if DETECTED_FONT_PATH else "Arial-Bold"
-
-            answer_text_clip = TextClip(
-                txt=answer_display_text,
-                fontsize=60, # Slightly larger font for answer
-                color=ANSWER_TEXT_COLOR, # Use constant
-                font=font_for_answer,
-                bg_color='rgba(0, 0, 0, 0.7)', # Slightly darker background
-                method='caption', # Wraps text automatically
-                size=(VIDEO_WIDTH - 2 * PADDING_X, None), # Width constrained by padding, height auto
-                align='West' # Align text left within the caption box
-            )
+    except Exception as e:
+        print(f"❌ Error creating answer reveal image: {e}")
+        traceback.print_exc()
+        return None
 
-            # Calculate position *after* clip is rendered to know its height
-            answer_clip_height = answer_text_clip.h
-            # Position it higher up, e.g., below the code block (estimate position)
-            # This needs refinement - ideally calculate based on actual content height
-            # For now, place it near the bottom but above the margin
-            pos_y = VIDEO_HEIGHT - answer_clip_height - BOTTOM_MARGIN - 20 # Position above bottom margin
 
-            answer_text_clip = answer_text_clip.set_position(('center', pos_y))
-            answer_text_clip = answer_text_clip.set_start(ANSWER_REVEAL_START_SECONDS)
-            answer_text_clip = answer_text_clip.set_duration(ANSWER_REVEAL_DURATION_SECONDS)
+# Step 3: Generate the video with animations
+def prepare_music_cache(duration):
+    """Loops/trims the music to `duration` seconds as AAC once; returns the cached file (or None)."""
+    if not MUSIC_FILE_EXISTS:
+        print(f"ℹ️ Music file not found at '{MUSIC_FILE_PATH}'. Creating video without audio.")
+        return None
+    # Content-addressed on the source file, so pointing MUSIC_FILE_PATH elsewhere (or
+    # replacing the file) never reuses a track made from different music
+    music_inputs = {
+        "source": os.path.abspath(MUSIC_FILE_PATH),
+        "size": MUSIC_FILE_STAT.st_size,
+        "mtime": MUSIC_FILE_STAT.st_mtime,
+    }
+    key = hashlib.blake2b(json.dumps(music_inputs, sort_keys=True).encode(), digest_size=16).hexdigest()
+    music_cache = MUSIC_CACHE_TEMPLATE.format(duration=duration, key=key)
+    if os.path.exists(music_cache):
+        print(f"✅ Using cached music: {music_cache}")
+        return music_cache
+
+    print(f"🎵 Preparing music ({duration}s) from: {MUSIC_FILE_PATH}")
+    # Encode to a temporary name, so a failed or interrupted run never leaves a truncated cache
+    base, ext = os.path.splitext(music_cache)
+    tmp_path = f"{base}.{os.getpid()}.tmp{ext}" # Keeps the extension so ffmpeg picks the same container
+    try:
+        subprocess.run(
+            [FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error',
+             '-stream_loop', '-1', '-i', MUSIC_FILE_PATH, # Repeats music shorter than the video
+             '-t', str(duration), '-vn', '-c:a', 'aac', '-b:a', '128k', tmp_path],
+            check=True,
+        )
+        os.replace(tmp_path, music_cache)
+        return music_cache
+    except Exception as e_music:
+        print(f"⚠️ Error preparing music file '{MUSIC_FILE_PATH}': {e_music}. Video will have no audio.")
+        return None
+    finally:
+        if os.path.exists(tmp_path):
+            try: os.remove(tmp_path)
+            except OSError: pass
 
-            # Add fade-in effect (optional)
-            answer_text_clip = answer_text_clip.fadein(0.5)
+def create_video(image_path, question_data, music_path=None, output_path=OUTPUT_VIDEO_PATH):
+    """
+    Creates the final video by handing the still image, answer reveal and music straight to ffmpeg.
+    music_path is the prepared track from prepare_music_cache (None for a silent video).
+    """
+    # create_text_image returns None on failure, so a path means the file was written
+    if not image_path:
+        print(f"❌ Cannot create video: Image path '{image_path}' is invalid or missing.")
+        return
 
-            clips_to_compose.append(answer_text_clip)
-            print("✅ Answer reveal clip created.")
+    # Encode into scratch space and move the finished file into place, so a failed
+    # encode never leaves a truncated output_path behind
+    if SCRATCH_DIR:
+        encode_path = os.path.join(SCRATCH_DIR, f"ytmovie_{os.getpid()}_{os.path.basename(output_path)}")
+    else:
+        encode_path = output_path
 
-        except Exception as e_textclip:
-            print(f"❌ Error creating answer TextClip: {e_textclip}")
-            print("ℹ️ Check font availability and TextClip parameters.")
+    try:
+        print("🎬 Starting video creation process...")
+        # --- Base Image Input ---
+        # ffmpeg loops the still image itself, so no frames are pushed through Python
+        ffmpeg_cmd = [
+            FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error', '-stats',
+            '-loop', '1', '-framerate', str(LOW_FPS), '-i', image_path,
+        ]
+        next_input_index = 1
+
+        # --- Answer Reveal Input ---
+        reveal_index = None
+        try:
+            print("🎨 Creating answer reveal banner...")
+            # Pre-rendered transparent banner; ffmpeg overlays it onto the reveal frames
+            reveal_path = create_reveal_image(question_data)
+            if not reveal_path:
+                raise RuntimeError("Answer reveal image could not be generated.")
+            ffmpeg_cmd += ['-loop', '1', '-framerate', str(VIDEO_FPS), '-i', reveal_path]
+            reveal_index = next_input_index
+            next_input_index += 1
+            print("✅ Answer reveal banner created.")
+
+        except Exception as e_reveal:
+            print(f"❌ Error creating answer reveal banner: {e_reveal}")
             traceback.print_exc()
             # Continue without answer reveal if it fails
 
-        # --- Composite Video ---
-        print("🧩 Compositing video clips...")
-        final_composite_clip = CompositeVideoClip(clips_to_compose, size=(VIDEO_WIDTH, VIDEO_HEIGHT))
-
-        # --- Set Audio ---
-        if music_clip:
-            print("🔊 Adding audio track...")
-            # Ensure audio duration precisely matches video after all composition
-            # Allow a small tolerance for floating point comparisons
-            if abs(music_clip.duration - final_composite_clip.duration) > 0.05:
-                 print(f"⚠️ Final audio/video duration mismatch. Adjusting audio clip duration from {music_clip.duration:.2f}s to {final_composite_clip.duration:.2f}s.")
-                 # Create a new subclip with the exact duration needed
-                 # This is safer than set_duration which can have issues
-                 try:
-                    # Create a subclip from the *looped* or *trimmed* clip
-                    adjusted_music_clip = music_clip.subclip(0, final_composite_clip.duration)
-                    # Close the previous music_clip instance *if* it's different
-                    if music_clip != adjusted_music_clip and hasattr(music_clip, 'close'):
-                        try: music_clip.close()
-                        except: pass
-                    music_clip = adjusted_music_clip # Use the adjusted clip
-                 except Exception as e_adjust:
-                     print(f"❌ Error adjusting audio duration: {e_adjust}. Audio might be out of sync.")
-                     # Proceed with potentially mismatched audio
-
-            final_composite_clip = final_composite_clip.set_audio(music_clip)
+        # --- Audio Input ---
+        audio_index = None
+        if music_path:
+            # Already the right length and codec, so it is stream-copied into the video
+            ffmpeg_cmd += ['-i', music_path]
+            audio_index = next_input_index
+            next_input_index += 1
+
+        # --- Filter Graph ---
+        if reveal_index is not None:
+            # Static part at LOW_FPS, then the reveal window at VIDEO_FPS with the banner
+            # fading in over ANSWER_FADE_IN_SECONDS, joined into one variable frame rate stream
+            # Banner: centered horizontally, just above the bottom margin
+            # (settb: every timestamp is a multiple of 1/VIDEO_FPS, which keeps x264's level sane)
+            filter_graph = (
+                f"[0:v]split[base][reveal_base];"
+                f"[base]trim=duration={ANSWER_REVEAL_START_SECONDS}[static];"
+                f"[reveal_base]fps={VIDEO_FPS},trim=start={ANSWER_REVEAL_START_SECONDS}:duration={ANSWER_REVEAL_DURATION_SECONDS},setpts=PTS-STARTPTS[reveal_bg];"
+                f"[{reveal_index}:v]trim=duration={ANSWER_REVEAL_DURATION_SECONDS},format=rgba,fade=t=in:st=0:d={ANSWER_FADE_IN_SECONDS}:alpha=1[reveal];"
+                f"[reveal_bg][reveal]overlay=x=(W-w)/2:y=H-h-{BOTTOM_MARGIN + 20}:format=auto[reveal_part];"
+                f"[static][reveal_part]concat=n=2:v=1:a=0,settb=1/{VIDEO_FPS}[v]"
+            )
+            # -vsync rather than -fps_mode, which only exists from FFmpeg 5.1 (4.x builds via FFMPEG_BINARY)
+            ffmpeg_cmd += ['-filter_complex', filter_graph, '-map', '[v]', '-vsync', 'vfr']
+        else:
+            ffmpeg_cmd += ['-map', '0:v']
+        if audio_index is not None:
+            ffmpeg_cmd += ['-map', f'{audio_index}:a', '-c:a', 'copy'] # AAC already, the standard audio codec for MP4
+
+        # --- Encoding Settings ---
+        if VIDEO_CODEC == "libx264":
+            # Constant quality instead of a target bitrate: the duplicate frames of a still
+            # slide cost almost no bits, so x264 doesn't spend effort hitting a bitrate
+            rate_control_params = ['-preset', VIDEO_PRESET, '-tune', 'stillimage', '-crf', str(VIDEO_CRF)]
+        else:
+            rate_control_params = ['-b:v', VIDEO_BITRATE] # Hardware encoders have no CRF mode
+        # Use available CPU cores for faster rendering (cpu_count() is None when undeterminable:
+        # leave the thread count to ffmpeg then, since "-threads None" is rejected)
+        cpu_count = os.cpu_count()
+        thread_params = ['-threads', str(cpu_count)] if cpu_count else []
+        ffmpeg_cmd += [
+            '-t', str(VIDEO_DURATION_SECONDS), # The only duration control: ends the looped image and any audio overrun together
+            '-c:v', VIDEO_CODEC,              # libx264 by default, or a hardware encoder (see VIDEO_CODEC)
+        ] + thread_params + rate_control_params + FFMPEG_HWACCEL_PARAMS + [ # Encoder-specific params
+            '-profile:v', 'high',             # H.264 profile
+            '-pix_fmt', 'yuv420p',            # Pixel format for compatibility
+            encode_path,
+        ]
 
         # --- Write Video File ---
-        print(f"💾 Writing video file to: {OUTPUT_VIDEO_PATH}")
-        final_composite_clip.write_videofile(
-            OUTPUT_VIDEO_PATH,
-            fps=VIDEO_FPS,
-            codec="libx264",         # Good balance of quality/compatibility
-            audio_codec="aac",       # Standard audio codec for MP4
-            bitrate=VIDEO_BITRATE,   # Control video quality/filesize
-            threads=os.cpu_count(),  # Use available CPU cores for faster rendering
-            preset='medium',         # Encoding speed vs compression ('slow'/'veryslow' for better quality/smaller size, but slower)
-            logger='bar',            # Show progress bar
-            ffmpeg_params=[          # Additional FFmpeg parameters if needed
-                '-profile:v', 'high', # H.264 profile
-                '-pix_fmt', 'yuv420p' # Pixel format for compatibility
-            ]
-        )
-        print(f"✅ Video generated successfully: {OUTPUT_VIDEO_PATH}")
+        print(f"💾 Writing video file to: {output_path}")
+        subprocess.run(ffmpeg_cmd, check=True)
+        if encode_path != output_path:
+            shutil.move(encode_path, output_path) # Copies across filesystems when needed
+        print(f"✅ Video generated successfully: {output_path}")
 
     except Exception as e:
         print(f"❌ Fatal Error generating video: {e}")
         traceback.print_exc()
     finally:
-        # --- Resource Cleanup ---
-        print("🧹 Cleaning up resources...")
-        # Safely attempt to close all MoviePy clip objects that were definitely created
-        clips_to_close = [img_clip, music_clip, answer_text_clip, final_composite_clip, full_music_clip]
-
-        for clip in clips_to_close:
-            # Check if the variable exists and holds a clip object
-            if clip is not None and hasattr(clip, 'close') and callable(clip.close):
-                try:
-                    clip.close()
-                    print(f"Closed clip: {type(clip).__name__}")
-                except Exception as e_close:
-                    # Don't crash the script if closing fails, just log it
-                    print(f"⚠️ Error closing clip resource ({type(clip).__name__}): {e_close}")
-        print("✅ Cleanup finished.")
+        # Drop a partial scratch file left by a failed encode
+        if encode_path != output_path and os.path.exists(encode_path):
+            try: os.remove(encode_path)
+            except OSError: pass
 
 
 # Main process execution
-def main():
-    """Main function to orchestrate the video generation."""
-    print("="*50)
-    print("🎬 Starting YouTube Shorts/Reels Trick Question Video Generator")
-    print("="*50)
-
-    # --- Font Setup ---
-    find_font() # Determine which font to use globally
-
-    # --- Step 1: Get Question Data ---
-    question_data = None
-    try:
-        question_data = fetch_question()
-    except Exception as e_fetch:
-        print(f"❌ Unhandled error during fetch_question: {e_fetch}")
-        traceback.print_exc()
-
-    if not question_data:
-        print("⚠️ Fetching question failed or Ollama not available. Using sample question.")
-        question_data = get_sample_question()
-
+def main_one(question_data, output_path=OUTPUT_VIDEO_PATH):
+    """Validates one question, saves its data, then creates its image and video."""
     # Final validation of the data we're about to use
     if not isinstance(question_data, dict) or not all(k in question_data for k in ["question", "code", "options", "correct_answer"]):
-        print("❌ FATAL: Question data is invalid even after fallback. Cannot proceed.")
+        print("❌ FATAL: Question data is invalid. Cannot render this video.")
         print(f"Data structure: {question_data}")
-        return # Exit script
+        return # Skip this question
 
     print("\n📝 Using Question Data:")
     print(f"   Question: {question_data.get('question', 'N/A')[:80]}...") # Truncate long questions
@@ -835,35 +1234,117 @@ def main():
 
     # Save the final question data used (useful for debugging/re-running)
     try:
-        with open(QUESTION_DATA_CACHE, "w", encoding='utf-8') as f:
-            json.dump(question_data, f, indent=4, ensure_ascii=False)
-        print(f"ℹ️ Question data saved to {QUESTION_DATA_CACHE}")
+        question_json = json.dumps(question_data, indent=4, ensure_ascii=False)
+        # Re-runs with the same question (e.g. the sample fallback) leave the file untouched
+        try:
+            with open(QUESTION_DATA_CACHE, "r", encoding='utf-8') as f:
+                unchanged = f.read() == question_json
+        except OSError:
+            unchanged = False
+        if unchanged:
+            print(f"ℹ️ Question data unchanged in {QUESTION_DATA_CACHE}")
+        else:
+            with open(QUESTION_DATA_CACHE, "w", encoding='utf-8') as f:
+                f.write(question_json)
+            print(f"ℹ️ Question data saved to {QUESTION_DATA_CACHE}")
     except Exception as e_json_save:
         print(f"⚠️ Error saving final question data to JSON: {e_json_save}")
 
 
-    # --- Step 2: Create Image ---
+    # --- Step 2: Create Image (and Prepare Music Alongside) ---
     image_path = None
-    try:
-        print("\n🖼️ Generating content image...")
-        image_path = create_text_image(question_data)
-    except Exception as e_img_create:
-        print(f"❌ Unhandled error during create_text_image: {e_img_create}")
-        traceback.print_exc()
+    music_path = None
+    print("\n🖼️ Generating content image...")
+    # Independent work: PIL rendering and the ffmpeg music subprocess both release the GIL
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Repeat questions (e.g. the sample fallback) are served from the render cache
+        image_future = executor.submit(create_text_image, question_data)
+        music_future = executor.submit(prepare_music_cache, VIDEO_DURATION_SECONDS)
+        try:
+            image_path = image_future.result()
+        except Exception as e_img_create:
+            print(f"❌ Unhandled error during create_text_image: {e_img_create}")
+            traceback.print_exc()
+        try:
+            music_path = music_future.result()
+        except Exception as e_music:
+            print(f"⚠️ Unhandled error while preparing music: {e_music}. Video will have no audio.")
+            traceback.print_exc()
 
     # --- Step 3: Create Video ---
     if image_path:
         try:
-            create_video(image_path, question_data)
+            create_video(image_path, question_data, music_path, output_path)
         except Exception as e_vid_create:
             print(f"❌ Unhandled error during create_video: {e_vid_create}")
             traceback.print_exc()
     else:
         print("❌ Image creation failed. Cannot proceed to video generation.")
 
+def main_batch(questions_path):
+    """Renders a video for every question in a JSON list file, paying imports and setup only once."""
+    try:
+        with open(questions_path, "r", encoding='utf-8') as f:
+            content = f.read()
+        questions = orjson.loads(content) if orjson else json.loads(content)
+    except Exception as e_batch:
+        print(f"❌ Could not read batch questions from '{questions_path}': {e_batch}")
+        return
+    if not isinstance(questions, list):
+        print(f"❌ Batch file '{questions_path}' must contain a JSON list of question objects.")
+        return
+
+    # One numbered video per question, next to OUTPUT_VIDEO_PATH
+    base, ext = os.path.splitext(OUTPUT_VIDEO_PATH)
+    for i, question_data in enumerate(questions, start=1):
+        print(f"\n📦 Batch question {i}/{len(questions)}")
+        # Same field checks as a question fetched from Ollama
+        validated_data = validate_question_data(question_data)
+        if not validated_data:
+            print(f"⚠️ Skipping batch question {i}: invalid question data.")
+            continue
+        try:
+            main_one(validated_data, output_path=f"{base}_{i:03d}{ext}")
+        except Exception as e_one:
+            # Keep going with the rest of the batch
+            print(f"❌ Unhandled error for batch question {i}: {e_one}")
+            traceback.print_exc()
+
+def main():
+    """Main function to orchestrate the video generation."""
+    parser = argparse.ArgumentParser(description="Generates trick question videos for YouTube Shorts/Reels.")
+    parser.add_argument("--batch", metavar="QUESTIONS_JSON",
+                        help="render one video per question in this JSON list instead of fetching a question")
+    args = parser.parse_args()
+
+    print("="*50)
+    print("🎬 Starting YouTube Shorts/Reels Trick Question Video Generator")
+    print("="*50)
+
+    # --- Font Setup ---
+    find_font() # Determine which font to use globally
+    select_video_codec() # Determine which video encoder to use globally
+
+    if args.batch:
+        main_batch(args.batch)
+    else:
+        # --- Step 1: Get Question Data ---
+        question_data = None
+        try:
+            question_data = fetch_question()
+        except Exception as e_fetch:
+            print(f"❌ Unhandled error during fetch_question: {e_fetch}")
+            traceback.print_exc()
+
+        if not question_data:
+            print("⚠️ Fetching question failed or Ollama not available. Using sample question.")
+            question_data = get_sample_question()
+
+        main_one(question_data)
+
     print("\n🏁 Process finished.")
     print("="*50)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()